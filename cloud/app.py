@@ -4,18 +4,76 @@ This provides a simple API that can be called from GitHub Pages
 """
 
 import gradio as gr
-from transformers import pipeline
 import json
+import os
 
-# Load the model
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+try:
+    # orjson serializes several times faster; plain JSON is the fallback
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+from embedding_index import EmbeddingIndex
+from explain import highlight_markdown
+from model_registry import ModelRegistry
+from profiling import profiler
+
+# Load the model. The registry can hot-swap or A/B new revisions later
+# through the hidden `deploy`/`traffic` endpoints.
+MODEL_ID = "kurtesianplane/copium-meter"
 print("Loading CopiumMeter model...")
-classifier = pipeline(
-    "text-classification", 
-    model="kurtesianplane/copium-meter",
-    top_k=None  # Return all scores
-)
+registry = ModelRegistry()
+# COPIUM_MODEL_REVISION is a Hub branch, tag or commit; it is also the routing label
+MODEL_REVISION = os.environ.get("COPIUM_MODEL_REVISION", "main")
+base_version = registry.load(MODEL_ID, revision=MODEL_REVISION, hub_revision=MODEL_REVISION)
 print("Model loaded!")
 
+# Admin endpoints (profiling, deploys) only work when COPIUM_ADMIN_TOKEN is set as a Space secret
+ADMIN_TOKEN = os.environ.get("COPIUM_ADMIN_TOKEN")
+
+# Optional similar-example index, built with the served model and revision:
+#   python embedding_index.py --model kurtesianplane/copium-meter --revision main build ...
+# Only served while the routed model matches the encoder the index was built with.
+INDEX_PATH = os.environ.get("COPIUM_INDEX_PATH", "copium_index")
+# SIMILAR_K is the default for both classify_api and /v1/classify. Similar
+# examples cost a second encoder pass per text, so clients opt in by default.
+MAX_SIMILAR = 20
+SIMILAR_K = min(int(os.environ.get("COPIUM_SIMILAR_K", "0")), MAX_SIMILAR)
+similar_index = None
+if os.path.isdir(INDEX_PATH):
+    similar_index = EmbeddingIndex(INDEX_PATH)
+    print(f"Similar-example index loaded ({len(similar_index)} examples)")
+    if not similar_index.matches(base_version.source, base_version.hub_revision):
+        print(f"⚠️ Similar-example index was built with {similar_index.encoder}@{similar_index.encoder_revision or 'main'}, "
+              f"not {base_version.source}@{base_version.hub_revision}; responses will not include similar examples")
+
+# Optional lexical cascade (build with: python cascade.py train/calibrate ...).
+# Confident inputs are answered by a hashed n-gram model without a DistilBERT pass.
+CASCADE_PATH = os.environ.get("COPIUM_CASCADE_PATH", "cascade.joblib")
+cascade = None
+if os.path.exists(CASCADE_PATH):
+    # Imported lazily so scikit-learn is only needed when a cascade is deployed
+    from cascade import LexicalCascade
+    cascade = LexicalCascade.load(CASCADE_PATH)
+    print(f"Lexical cascade loaded (threshold {cascade.threshold:.3f})")
+
+# Token-importance explanations (gradient or occlusion), cached per text and model version
+EXPLAIN_METHOD = os.environ.get("COPIUM_EXPLAIN_METHOD", "gradient")
+
+# On-demand profiling: COPIUM_PROFILE_RATE=0.01 profiles ~1% of requests.
+# Can also be toggled at runtime through the hidden `profile` endpoint.
+profiler.enable(rate=float(os.environ.get("COPIUM_PROFILE_RATE", "0")))
+
+# Batch limits for the /v1/classify JSON endpoint
+BATCH_SIZE = 32
+MAX_BATCH = 256
+
 # Label mapping
 LABELS = {
     "LABEL_0": {"name": "Copium", "emoji": "💀", "description": "Denial, coping, rationalization"},
@@ -24,14 +82,8 @@ LABELS = {
     "LABEL_3": {"name": "Neutral", "emoji": "😐", "description": "Factual, objective, informational"}
 }
 
-def classify_text(text):
-    """Classify text and return formatted results"""
-    if not text or not text.strip():
-        return "Please enter some text to analyze."
-    
-    # Get predictions
-    results = classifier(text)[0]
-    
+def format_results(results):
+    """Format pipeline scores as Markdown with score bars"""
     # Sort by score descending
     results = sorted(results, key=lambda x: x['score'], reverse=True)
     
@@ -53,12 +105,37 @@ def classify_text(text):
     
     return output
 
-def classify_api(text):
-    """API endpoint that returns JSON"""
+def classify_text(text):
+    """Classify text and return formatted results"""
     if not text or not text.strip():
-        return {"error": "No text provided"}
+        return "Please enter some text to analyze."
     
-    results = classifier(text)[0]
+    # Get predictions
+    with registry.acquire() as version:
+        with version.timed("classify_text"), profiler.capture("classify_text"):
+            results = version.classifier(text)[0]
+    
+    return format_results(results)
+
+def explain_text(text):
+    """Classify text and highlight the words that drove the prediction"""
+    if not text or not text.strip():
+        return "Please enter some text to analyze."
+    
+    # Both methods run the unmodified text, so the prediction comes for free
+    with registry.acquire() as version:
+        with version.timed("explain"):
+            explanation = version.explainer.explain(text, method=EXPLAIN_METHOD)
+    
+    output = format_results(explanation['results'])
+    output += "\n### Why:\n"
+    output += highlight_markdown(explanation['tokens']) + "\n\n"
+    output += "*Red words pushed toward this label, blue words pushed away from it.*\n"
+    
+    return output
+
+def format_api_result(results, revision, similar=None, stage="model"):
+    """Format pipeline scores as the JSON returned by classify_api"""
     results = sorted(results, key=lambda x: x['score'], reverse=True)
     
     # Format for API
@@ -73,11 +150,97 @@ def classify_api(text):
             "description": info.get('description', '')
         })
     
-    return {
+    response = {
         "prediction": formatted[0]['label'],
         "confidence": formatted[0]['score'],
-        "results": formatted
+        "results": formatted,
+        "revision": revision,
+        "stage": stage
     }
+    
+    if similar is not None:
+        response["similar"] = similar
+    
+    return response
+
+def classify_batch(texts, similar_k=SIMILAR_K):
+    """Classify several texts in one pipeline call; shared by classify_api and /v1/classify"""
+    # Cascade answers the confident texts; only the rest pay for a transformer pass.
+    # Its answers come from no model version, so they carry no revision.
+    answered = cascade.route(texts) if cascade is not None else {}
+    remaining = [i for i in range(len(texts)) if i not in answered]
+    responses = [format_api_result(answered[i], None, stage="cascade") if i in answered else None
+                 for i in range(len(texts))]
+    if not remaining:
+        return responses
+    
+    with registry.acquire() as version:
+        with version.timed("classify_batch", len(remaining)), profiler.capture("classify_api"):
+            model_results = version.classifier([texts[i] for i in remaining], batch_size=BATCH_SIZE)
+        
+        # Nearest training examples: one encoder pass for the model-routed texts, and
+        # only when the index lives in this version's embedding space. Cascade-answered
+        # texts never get them, since that would cost the encoder pass the cascade saved.
+        similar = [None] * len(remaining)
+        if (similar_index is not None and similar_k
+                and similar_index.matches(version.source, version.hub_revision)):
+            similar = similar_index.similar_batch(
+                [texts[i] for i in remaining], version.classifier.tokenizer, version.classifier.model, k=similar_k
+            )
+        
+        for i, results, hits in zip(remaining, model_results, similar):
+            responses[i] = format_api_result(results, version.revision, hits)
+    
+    return responses
+
+def classify_api(text, similar_k=SIMILAR_K):
+    """API endpoint that returns JSON"""
+    if not text or not text.strip():
+        return {"error": "No text provided"}
+    
+    return classify_batch([text], similar_k)[0]
+
+def set_profiling(token, rate):
+    """Turn request profiling on (rate > 0) or off at runtime"""
+    if not ADMIN_TOKEN or token != ADMIN_TOKEN:
+        return {"error": "Admin endpoints are disabled"}
+    
+    profiler.enable(rate=float(rate or 0))
+    return {"enabled": profiler.enabled, "rate": profiler.rate, "output_dir": profiler.output_dir}
+
+def deploy_model(token, path, revision, hub_revision, traffic, replace=False):
+    """Load a local path or Hub id in the background, then give it `traffic`% (100 = full switch)
+
+    Redeploying a loaded revision label needs `replace`; the old version drains first.
+    """
+    if not ADMIN_TOKEN or token != ADMIN_TOKEN:
+        return {"error": "Admin endpoints are disabled"}
+    if not path:
+        return {"error": "No model path provided"}
+    
+    traffic = 100 if traffic is None else traffic
+    try:
+        revision = registry.load_async(path, revision=revision or None, traffic=traffic,
+                                       hub_revision=hub_revision or None, replace=bool(replace))
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"status": "loading", "revision": revision, "traffic": traffic}
+
+def set_traffic(token, traffic):
+    """Replace the traffic split, e.g. {"main": 90, "v2": 10}; returns per-version and cascade stats"""
+    if not ADMIN_TOKEN or token != ADMIN_TOKEN:
+        return {"error": "Admin endpoints are disabled"}
+    
+    if traffic:
+        try:
+            registry.set_traffic(traffic)
+        except ValueError as e:
+            return {"error": str(e)}
+    
+    stats = registry.stats()
+    if cascade is not None:
+        stats["cascade"] = cascade.stats()
+    return stats
 
 # Create Gradio interface
 with gr.Blocks(title="CopiumMeter 🧪") as demo:
@@ -99,14 +262,18 @@ with gr.Blocks(title="CopiumMeter 🧪") as demo:
                 placeholder="Type something like: 'I'm totally fine with losing, it's not like I even tried anyway'",
                 lines=3
             )
-            analyze_btn = gr.Button("🔍 Analyze", variant="primary")
+            with gr.Row():
+                analyze_btn = gr.Button("🔍 Analyze", variant="primary")
+                explain_btn = gr.Button("💡 Explain")
         
         with gr.Column():
-            output = gr.Markdown(label="Result")
+            # Explanations use inline <mark> styling; user words are escaped in explain.py
+            output = gr.Markdown(label="Result", sanitize_html=False)
     
     # UI uses markdown output
     analyze_btn.click(fn=classify_text, inputs=text_input, outputs=output, api_name="predict")
     text_input.submit(fn=classify_text, inputs=text_input, outputs=output)
+    explain_btn.click(fn=explain_text, inputs=text_input, outputs=output, api_name="explain")
     
     # Hidden JSON API endpoint for programmatic access
     with gr.Row(visible=False):
@@ -114,6 +281,24 @@ with gr.Blocks(title="CopiumMeter 🧪") as demo:
         api_json_output = gr.JSON()
         api_btn = gr.Button()
         api_btn.click(fn=classify_api, inputs=api_text_input, outputs=api_json_output, api_name="classify")
+        
+        # Admin endpoints, all gated on COPIUM_ADMIN_TOKEN
+        admin_token_input = gr.Textbox()
+        admin_number_input = gr.Number()
+        admin_output = gr.JSON()
+        profile_btn = gr.Button()
+        profile_btn.click(fn=set_profiling, inputs=[admin_token_input, admin_number_input], outputs=admin_output, api_name="profile")
+        
+        deploy_path_input = gr.Textbox()
+        deploy_revision_input = gr.Textbox()
+        deploy_hub_revision_input = gr.Textbox()
+        deploy_replace_input = gr.Checkbox()
+        deploy_btn = gr.Button()
+        deploy_btn.click(fn=deploy_model, inputs=[admin_token_input, deploy_path_input, deploy_revision_input, deploy_hub_revision_input, admin_number_input, deploy_replace_input], outputs=admin_output, api_name="deploy")
+        
+        traffic_input = gr.JSON()
+        traffic_btn = gr.Button()
+        traffic_btn.click(fn=set_traffic, inputs=[admin_token_input, traffic_input], outputs=admin_output, api_name="traffic")
     
     gr.Markdown("""
     ---
@@ -130,8 +315,51 @@ with gr.Blocks(title="CopiumMeter 🧪") as demo:
     POST https://kurtesianplane-copium-meter.hf.space/api/classify
     {"data": ["your text here"]}
     ```
+    
+    **For Markdown output with highlighted words:**
+    ```
+    POST https://kurtesianplane-copium-meter.hf.space/api/explain
+    {"data": ["your text here"]}
+    ```
+    
+    **Lightweight JSON (one request, no queue/SSE; recommended for scripts):**
+    ```
+    POST https://kurtesianplane-copium-meter.hf.space/v1/classify
+    {"text": "your text here"}
+    {"texts": ["first text", "second text"]}
+    {"text": "your text here", "similar_k": 3}
+    ```
+    `similar_k` (0-20, default 0) sets how many similar training examples to return when an index is deployed.
+    Results answered by the lexical cascade (`"stage": "cascade"`, `"revision": null`) never include them.
     """)
 
-# Add the API function explicitly
+# Plain ASGI JSON endpoint for machine clients, mounted next to the Gradio UI.
+# It skips Gradio's event queue and SSE round trip: one POST, one response.
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["POST"], allow_headers=["*"])
+
+@app.post("/v1/classify")
+def classify_json(payload: dict):
+    """{"text": "..."} -> one result, {"texts": [...]} -> {"results": [...]}"""
+    similar_k = payload.get("similar_k", SIMILAR_K)
+    if isinstance(similar_k, bool) or not isinstance(similar_k, int) or not 0 <= similar_k <= MAX_SIMILAR:
+        return FastJSONResponse({"error": f"similar_k must be an integer from 0 to {MAX_SIMILAR}"}, status_code=400)
+    
+    if "texts" in payload:
+        texts = payload["texts"]
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) and t.strip() for t in texts):
+            return FastJSONResponse({"error": "texts must be a non-empty list of non-empty strings"}, status_code=400)
+        if len(texts) > MAX_BATCH:
+            return FastJSONResponse({"error": f"At most {MAX_BATCH} texts per request"}, status_code=400)
+        return {"results": classify_batch(texts, similar_k)}
+    
+    text = payload.get("text")
+    if not isinstance(text, str) or not text.strip():
+        return FastJSONResponse({"error": "No text provided"}, status_code=400)
+    return classify_batch([text], similar_k)[0]
+
 demo.queue()
-demo.launch()
+app = gr.mount_gradio_app(app, demo, path="/")
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", "7860")), timeout_keep_alive=75)
@@ -0,0 +1,89 @@
+"""
+CopiumMeter Bulk Scoring
+Classify a whole dataset file and write predictions, streaming batch by batch.
+
+Only the `text` column is read, and Parquet input is streamed by row group,
+so memory stays flat regardless of corpus size. Output keeps the
+text,label,class schema (label/class are the predictions) plus a
+confidence column.
+
+Usage:
+    python bulk_score.py corpus.parquet scored.parquet
+    python bulk_score.py corpus.csv scored.csv --batch-size 128
+"""
+
+import argparse
+
+import pandas as pd
+import torch
+from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
+
+from dataset_io import DatasetWriter, count_rows, iter_dataset
+
+MODEL_PATH = 'copium_model'
+BATCH_SIZE = 64
+READ_BATCH_SIZE = 10_000
+CLASSES = ['copium', 'sarcastic', 'sincere', 'neutral']
+
+
+def score_texts(texts, tokenizer, model, batch_size=BATCH_SIZE):
+    """Return (labels, confidences) for a list of texts"""
+    device = next(model.parameters()).device
+    labels, confidences = [], []
+    with torch.no_grad():
+        for start in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[start:start + batch_size], return_tensors='pt', padding=True,
+                               truncation=True, max_length=128).to(device)
+            probs = torch.softmax(model(**inputs).logits, dim=1)
+            conf, pred = probs.max(dim=1)
+            labels.extend(pred.tolist())
+            confidences.extend(conf.tolist())
+    return labels, confidences
+
+
+def predictions_frame(texts, labels, confidences):
+    """Output rows with fixed dtypes, so an empty input still gets the full schema"""
+    return pd.DataFrame({
+        'text': pd.Series(texts, dtype='string'),
+        'label': pd.Series(labels, dtype='int64'),
+        'class': pd.Series([CLASSES[label] for label in labels], dtype='string'),
+        'confidence': pd.Series(confidences, dtype='float64'),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet/Arrow dataset with CopiumMeter")
+    parser.add_argument('input', help="Dataset with a 'text' column")
+    parser.add_argument('output', help="Output file; format follows the extension")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    print("Loading model...")
+    device = torch.device('cuda') if torch.cuda.is_available() else torch.device('cpu')
+    tokenizer = DistilBertTokenizer.from_pretrained(args.model)
+    model = DistilBertForSequenceClassification.from_pretrained(args.model).to(device)
+    model.eval()
+
+    # Known up front only for Parquet; CSV would need a second full parse
+    total = count_rows(args.input)
+    done = 0
+    with DatasetWriter(args.output) as writer:
+        for chunk in iter_dataset(args.input, columns=['text'], batch_size=READ_BATCH_SIZE):
+            texts = chunk['text'].fillna('').astype(str).tolist()
+            labels, confidences = score_texts(texts, tokenizer, model, args.batch_size)
+            writer.write(predictions_frame(texts, labels, confidences))
+            done += len(texts)
+            print(f"Scored {done}/{total}" if total is not None else f"Scored {done}")
+
+        if done == 0:
+            writer.write(predictions_frame([], [], []))
+
+    if done == 0:
+        print(f"⚠️ {args.input} has no rows; wrote an empty {args.output}")
+    else:
+        print(f"✅ Wrote {done} predictions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+CopiumMeter Lexical Cascade
+A cheap hashed n-gram linear model that answers obvious inputs before DistilBERT.
+
+Trained on the same text,label,class CSV as the transformer. When its
+calibrated confidence is at or above `threshold` the cascade answers
+directly; everything else goes to the full model. `calibrate` picks the
+threshold that meets a target agreement rate with the full model.
+
+Usage:
+    python cascade.py train copium_dataset.csv --out cascade.joblib
+    python cascade.py train copium_dataset.parquet --out cascade.joblib
+    python cascade.py calibrate cascade.joblib holdout.csv --target 0.98
+"""
+
+import argparse
+import threading
+
+import joblib
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+from dataset_io import read_dataset
+
+MODEL_PATH = 'copium_model'
+CASCADE_PATH = 'cascade.joblib'
+DEFAULT_THRESHOLD = 0.95
+N_FEATURES = 2 ** 18
+
+
+def train_cascade(texts, labels):
+    """Fit a TF-IDF weighted, hashed word 1-2 gram logistic regression with sigmoid calibration"""
+    pipe = make_pipeline(
+        HashingVectorizer(ngram_range=(1, 2), n_features=N_FEATURES, alternate_sign=False, norm=None),
+        TfidfTransformer(sublinear_tf=True),
+        CalibratedClassifierCV(LogisticRegression(max_iter=1000, C=4.0), method='sigmoid', cv=3)
+    )
+    pipe.fit(texts, labels)
+    return pipe
+
+
+class LexicalCascade:
+    """Loaded cascade model plus counters for how much traffic it handles"""
+
+    def __init__(self, pipe, threshold=DEFAULT_THRESHOLD):
+        self.pipe = pipe
+        self.threshold = threshold
+        self.classes = [int(c) for c in pipe.classes_]
+        self.total = 0
+        self.handled = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=CASCADE_PATH):
+        artifact = joblib.load(path)
+        return cls(artifact['pipeline'], artifact.get('threshold', DEFAULT_THRESHOLD))
+
+    def save(self, path=CASCADE_PATH):
+        joblib.dump({'pipeline': self.pipe, 'threshold': self.threshold}, path)
+
+    def predict_proba(self, texts):
+        return self.pipe.predict_proba(texts)
+
+    def route(self, texts):
+        """Return {index: pipeline-style results} for the texts the cascade is sure about"""
+        probs = self.predict_proba(texts)
+        confident = np.flatnonzero(probs.max(axis=1) >= self.threshold)
+
+        with self._lock:
+            self.total += len(texts)
+            self.handled += len(confident)
+
+        return {
+            int(i): [{"label": f"LABEL_{c}", "score": float(p)} for c, p in zip(self.classes, probs[i])]
+            for i in confident
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "requests": self.total,
+                "handled": self.handled,
+                "handled_fraction": self.handled / self.total if self.total else None,
+            }
+
+
+def choose_threshold(confidence, agrees, target):
+    """Lowest threshold whose cascade-handled inputs agree with the full model >= `target`
+
+    Sorting by confidence (descending), the agreement of the top-n inputs is a
+    running mean; the threshold is the confidence of the largest n that still
+    meets the target. Returns (threshold, coverage, agreement).
+    """
+    order = np.argsort(-confidence)
+    running = np.cumsum(agrees[order]) / np.arange(1, len(order) + 1)
+    # Only cut between distinct confidences: `>= threshold` admits the whole tie group
+    ranked = confidence[order]
+    group_end = np.append(ranked[1:] != ranked[:-1], True)
+    ok = np.flatnonzero((running >= target) & group_end)
+    if len(ok) == 0:
+        return 1.0, 0.0, None
+    n = ok[-1] + 1
+    return float(confidence[order[n - 1]]), float(n / len(order)), float(running[n - 1])
+
+
+def full_model_predictions(texts, model_path=MODEL_PATH, batch_size=64):
+    """Argmax predictions of the full DistilBERT model"""
+    import torch
+    from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
+
+    tokenizer = DistilBertTokenizer.from_pretrained(model_path)
+    model = DistilBertForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+
+    predictions = []
+    with torch.no_grad():
+        for start in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[start:start + batch_size], return_tensors='pt',
+                               padding=True, truncation=True, max_length=128)
+            predictions.extend(torch.argmax(model(**inputs).logits, dim=1).tolist())
+    return np.array(predictions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or calibrate the CopiumMeter lexical cascade")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    train = sub.add_parser('train', help="Train on a text,label,class dataset")
+    train.add_argument('dataset', help="CSV, Parquet or Arrow file")
+    train.add_argument('--out', default=CASCADE_PATH)
+
+    calibrate = sub.add_parser('calibrate', help="Pick the threshold for a target agreement rate")
+    calibrate.add_argument('cascade', help="Trained cascade file")
+    calibrate.add_argument('dataset', help="Held-out CSV/Parquet/Arrow file with a 'text' column")
+    calibrate.add_argument('--model', default=MODEL_PATH, help="Full copium_model to agree with")
+    calibrate.add_argument('--target', type=float, default=0.98, help="Required agreement rate")
+
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        df = read_dataset(args.dataset, columns=['text', 'label']).dropna(subset=['text'])
+        cascade = LexicalCascade(train_cascade(df['text'].astype(str).tolist(), df['label'].tolist()))
+        cascade.save(args.out)
+        print(f"✅ Trained cascade on {len(df)} samples -> {args.out}")
+        print("💡 Run 'calibrate' on held-out data to set the threshold")
+        return
+
+    cascade = LexicalCascade.load(args.cascade)
+    texts = read_dataset(args.dataset, columns=['text']).dropna(subset=['text'])['text'].astype(str).tolist()
+
+    print(f"Scoring {len(texts)} texts with the full model...")
+    full = full_model_predictions(texts, args.model)
+    probs = cascade.predict_proba(texts)
+    lexical = np.array(cascade.classes)[probs.argmax(axis=1)]
+
+    threshold, coverage, agreement = choose_threshold(probs.max(axis=1), (lexical == full).astype(float), args.target)
+    if agreement is None:
+        print(f"❌ No threshold reaches {args.target:.1%} agreement; cascade would handle nothing")
+        return
+
+    cascade.threshold = threshold
+    cascade.save(args.cascade)
+    print(f"✅ Threshold {threshold:.4f}: cascade handles {coverage:.1%} of inputs "
+          f"with {agreement:.1%} agreement with the full model")
+
+
+if __name__ == "__main__":
+    main()
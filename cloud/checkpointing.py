@@ -0,0 +1,199 @@
+"""
+CopiumMeter Checkpointing
+Resumable training state and background evaluation for CopiumMeter_Training.ipynb.
+
+A checkpoint directory holds model weights, optimizer state, every RNG and the
+dataloader position, so a killed kernel or preempted instance picks up at the
+exact batch it stopped on. Checkpoints are written to a temp directory and
+renamed into place, so readers never see a half-written one.
+"""
+
+import json
+import os
+import random
+import shutil
+import time
+import multiprocessing as mp
+
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+CHECKPOINT_PREFIX = 'checkpoint-'
+EVAL_LOG = 'eval_log.jsonl'
+
+
+class ResumableSampler(Sampler):
+    """Seeded per-epoch shuffle that can start part-way through an epoch"""
+
+    def __init__(self, data_source, seed=42):
+        self.num_samples = len(data_source)
+        self.seed = seed
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch, start=0):
+        """Select the epoch's permutation and skip the first `start` samples"""
+        self.epoch = epoch
+        self.start = start
+
+    def __iter__(self):
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+        order = torch.randperm(self.num_samples, generator=generator).tolist()
+        return iter(order[self.start:])
+
+    def __len__(self):
+        return max(self.num_samples - self.start, 0)
+
+
+def _rng_state():
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def _set_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def list_checkpoints(checkpoint_dir):
+    """Return complete checkpoint paths, oldest first"""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    names = sorted(n for n in os.listdir(checkpoint_dir) if n.startswith(CHECKPOINT_PREFIX))
+    return [os.path.join(checkpoint_dir, n) for n in names]
+
+
+def latest_checkpoint(checkpoint_dir):
+    """Return the newest checkpoint path, or None"""
+    checkpoints = list_checkpoints(checkpoint_dir)
+    return checkpoints[-1] if checkpoints else None
+
+
+def save_checkpoint(checkpoint_dir, model, optimizer, global_step, epoch, batch_in_epoch, keep=3):
+    """Atomically write a checkpoint and delete all but the newest `keep`"""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    name = f"{CHECKPOINT_PREFIX}{global_step:08d}"
+    final_path = os.path.join(checkpoint_dir, name)
+    tmp_path = os.path.join(checkpoint_dir, f".tmp-{name}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    torch.save(model.state_dict(), os.path.join(tmp_path, 'model.pt'))
+    torch.save(optimizer.state_dict(), os.path.join(tmp_path, 'optimizer.pt'))
+    torch.save({
+        'global_step': global_step,
+        'epoch': epoch,
+        'batch_in_epoch': batch_in_epoch,
+        'rng': _rng_state(),
+    }, os.path.join(tmp_path, 'trainer_state.pt'))
+
+    shutil.rmtree(final_path, ignore_errors=True)
+    os.rename(tmp_path, final_path)
+
+    for old in list_checkpoints(checkpoint_dir)[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+
+    return final_path
+
+
+def load_checkpoint(path, model, optimizer=None):
+    """Restore model, optimizer and RNG state; returns the trainer state dict"""
+    device = next(model.parameters()).device
+    model.load_state_dict(torch.load(os.path.join(path, 'model.pt'), map_location=device))
+    if optimizer is not None:
+        optimizer.load_state_dict(torch.load(os.path.join(path, 'optimizer.pt'), map_location=device))
+
+    # RNG states contain numpy/python objects, so this file is not weights-only
+    state = torch.load(os.path.join(path, 'trainer_state.pt'), weights_only=False)
+    _set_rng_state(state['rng'])
+    return state
+
+
+def _evaluate(model, tokenizer, texts, labels, batch_size):
+    from sklearn.metrics import accuracy_score, f1_score
+
+    predictions = []
+    with torch.no_grad():
+        for start in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[start:start + batch_size], return_tensors='pt',
+                               padding=True, truncation=True, max_length=128)
+            predictions.extend(torch.argmax(model(**inputs).logits, dim=1).tolist())
+
+    return {
+        'accuracy': accuracy_score(labels, predictions),
+        'f1_weighted': f1_score(labels, predictions, average='weighted'),
+    }
+
+
+def _eval_worker(checkpoint_dir, texts, labels, base_model, num_labels, stop_event, poll_seconds, batch_size):
+    from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
+
+    # Stay off the GPU and leave most CPU threads to the training loop
+    torch.set_num_threads(max(1, (os.cpu_count() or 2) // 4))
+    tokenizer = DistilBertTokenizer.from_pretrained(base_model)
+    model = DistilBertForSequenceClassification.from_pretrained(base_model, num_labels=num_labels)
+    model.eval()
+
+    evaluated = None
+    while True:
+        stopping = stop_event.is_set()
+        path = latest_checkpoint(checkpoint_dir)
+        if path is not None and path != evaluated:
+            try:
+                model.load_state_dict(torch.load(os.path.join(path, 'model.pt'), map_location='cpu'))
+            except (FileNotFoundError, RuntimeError):
+                # Rotated away while we were loading; pick up the next one
+                time.sleep(poll_seconds)
+                continue
+
+            metrics = _evaluate(model, tokenizer, texts, labels, batch_size)
+            metrics['checkpoint'] = os.path.basename(path)
+            metrics['time'] = time.time()
+            with open(os.path.join(checkpoint_dir, EVAL_LOG), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(metrics) + '\n')
+            print(f"[eval] {metrics['checkpoint']}: accuracy={metrics['accuracy']:.4f} "
+                  f"f1={metrics['f1_weighted']:.4f}", flush=True)
+            evaluated = path
+            continue
+
+        if stopping:
+            break
+        stop_event.wait(poll_seconds)
+
+
+class BackgroundEvaluator:
+    """Evaluates the latest checkpoint in a separate process so training never stalls
+
+    Intermediate checkpoints are skipped if training outpaces evaluation; the
+    final checkpoint is always evaluated before `stop()` returns.
+    """
+
+    def __init__(self, checkpoint_dir, texts, labels, base_model='distilbert-base-uncased',
+                 num_labels=4, poll_seconds=30, batch_size=64):
+        # spawn, not fork: the parent may already hold CUDA state
+        ctx = mp.get_context('spawn')
+        self.stop_event = ctx.Event()
+        self.process = ctx.Process(
+            target=_eval_worker,
+            args=(checkpoint_dir, list(texts), list(labels), base_model, num_labels,
+                  self.stop_event, poll_seconds, batch_size),
+            daemon=True
+        )
+
+    def start(self):
+        self.process.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        self.process.join(timeout)
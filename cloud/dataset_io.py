@@ -0,0 +1,146 @@
+"""
+CopiumMeter Dataset I/O
+Read and write text,label,class datasets as Parquet, Arrow IPC or CSV.
+
+The format is picked from the file extension:
+    .parquet / .pq          Parquet (column projection, row-group streaming, memory-mapped reads)
+    .arrow / .feather / .ipc Arrow IPC (zero-copy memory-mapped reads)
+    anything else           CSV fallback
+
+Parquet and Arrow need pyarrow; CSV works with pandas alone.
+"""
+
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNS = ['text', 'label', 'class']
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+ROW_GROUP_SIZE = 100_000
+BATCH_SIZE = 10_000
+
+
+def dataset_format(path):
+    """Return 'parquet', 'arrow' or 'csv' for a path"""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in PARQUET_EXTENSIONS:
+        return 'parquet'
+    if ext in ARROW_EXTENSIONS:
+        return 'arrow'
+    return 'csv'
+
+
+def _require_pyarrow(path):
+    if pa is None:
+        raise ImportError(f"pyarrow is required to read or write {path} (pip install pyarrow), or use a .csv file")
+
+
+def read_dataset(path, columns=None):
+    """Load a dataset into a DataFrame, reading only `columns` when given"""
+    fmt = dataset_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=columns)
+
+    _require_pyarrow(path)
+    if fmt == 'parquet':
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def iter_dataset(path, columns=None, batch_size=BATCH_SIZE):
+    """Yield the dataset as DataFrames of at most `batch_size` rows without loading it all"""
+    fmt = dataset_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=batch_size)
+        return
+
+    _require_pyarrow(path)
+    if fmt == 'parquet':
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_size, columns=columns)
+    else:
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        batches = table.to_batches(max_chunksize=batch_size)
+    for batch in batches:
+        yield batch.to_pandas()
+
+
+def dataset_columns(path):
+    """Column names without reading any rows"""
+    fmt = dataset_format(path)
+    if fmt == 'csv':
+        return list(pd.read_csv(path, nrows=0).columns)
+
+    _require_pyarrow(path)
+    if fmt == 'parquet':
+        return pq.read_schema(path).names
+    return feather.read_table(path, memory_map=True).column_names
+
+
+def count_rows(path):
+    """Row count from Parquet footer metadata; None for CSV/Arrow, which would need a scan"""
+    if dataset_format(path) != 'parquet':
+        return None
+    _require_pyarrow(path)
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def write_dataset(df, path):
+    """Write a DataFrame in the format implied by `path`"""
+    fmt = dataset_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return
+
+    _require_pyarrow(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if fmt == 'parquet':
+        pq.write_table(table, path, row_group_size=ROW_GROUP_SIZE, compression='zstd')
+    else:
+        feather.write_feather(table, path, compression='uncompressed')  # mmap-able as-is
+
+
+class DatasetWriter:
+    """Append DataFrames to a dataset file batch by batch (Parquet row groups or CSV chunks)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.format = dataset_format(path)
+        self._writer = None
+        self._header_written = False
+        if self.format != 'csv':
+            _require_pyarrow(path)
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.path, index=False, mode='a' if self._header_written else 'w',
+                      header=not self._header_written)
+            self._header_written = True
+            return
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            if self.format == 'parquet':
+                self._writer = pq.ParquetWriter(self.path, table.schema, compression='zstd')
+            else:
+                self._writer = pa.ipc.new_file(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,292 @@
+"""
+CopiumMeter Embedding Index
+Find training/annotation examples that look like a given input.
+
+Embeddings are mean-pooled DistilBERT sentence vectors taken from the
+`copium_model` encoder, L2-normalized and stored as a float16 memory-mapped
+matrix so cosine similarity is just a dot product.
+
+Usage:
+    python embedding_index.py build copium_dataset.csv --out copium_index
+    python embedding_index.py build copium_dataset.parquet --out copium_index
+    python embedding_index.py build copium_dataset.csv --out copium_index --ivf 256
+    python embedding_index.py --model kurtesianplane/copium-meter --revision main build copium_dataset.csv
+    python embedding_index.py search copium_index "Whatever, I didn't want it anyway" -k 5
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
+
+import dataset_io
+from dataset_io import dataset_columns, read_dataset, write_dataset
+
+MODEL_PATH = 'copium_model'
+BATCH_SIZE = 64
+MAX_LENGTH = 128
+SEARCH_CHUNK = 65536  # rows scored per matmul during brute-force search
+
+EMBEDDINGS_FILE = 'embeddings.f16'
+EXAMPLES_FILES = ('examples.parquet', 'examples.csv')  # Parquet when pyarrow is available
+META_FILE = 'meta.json'
+IVF_FILE = 'ivf.npz'
+
+
+def load_encoder(model_path=MODEL_PATH, revision=None):
+    """Load tokenizer and classifier; the encoder is `model.distilbert`"""
+    tokenizer = DistilBertTokenizer.from_pretrained(model_path, revision=revision)
+    model = DistilBertForSequenceClassification.from_pretrained(model_path, revision=revision)
+    model.eval()
+    return tokenizer, model
+
+
+def embed_texts(texts, tokenizer, model, batch_size=BATCH_SIZE):
+    """Return L2-normalized mean-pooled sentence embeddings (float32, [n, dim])"""
+    device = next(model.parameters()).device
+    # Sort by length so each batch pads to a similar size
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    out = np.empty((len(texts), model.config.dim), dtype=np.float32)
+
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            batch = [texts[i] for i in idx]
+            inputs = tokenizer(batch, return_tensors='pt', padding=True,
+                               truncation=True, max_length=MAX_LENGTH).to(device)
+            hidden = model.distilbert(**inputs).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            pooled = torch.nn.functional.normalize(pooled, dim=-1)
+            out[idx] = pooled.cpu().numpy()
+
+    return out
+
+
+def _kmeans(vectors, n_lists, iterations=20, seed=42):
+    """Spherical k-means on a sample of the corpus; returns unit-norm centroids"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), n_lists * 64)
+    sample = np.asarray(vectors[rng.choice(len(vectors), sample_size, replace=False)], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True).clip(min=1e-12)
+
+    return centroids
+
+
+class EmbeddingIndex:
+    """Memory-mapped float16 embedding matrix plus the examples it was built from"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+        self.embeddings = np.memmap(
+            os.path.join(path, EMBEDDINGS_FILE), dtype=np.float16, mode='r',
+            shape=(self.meta['count'], self.meta['dim'])
+        )
+        examples_path = next(os.path.join(path, name) for name in EXAMPLES_FILES
+                             if os.path.exists(os.path.join(path, name)))
+        self.examples = read_dataset(examples_path)
+
+        # Optional IVF index: vectors are grouped by nearest centroid so a
+        # query only scans the `nprobe` closest lists
+        self.centroids = None
+        ivf_path = os.path.join(path, IVF_FILE)
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            self.centroids = ivf['centroids']
+            self.list_order = ivf['order']
+            self.list_offsets = ivf['offsets']
+
+    def __len__(self):
+        return self.meta['count']
+
+    @classmethod
+    def build(cls, df, out_dir, tokenizer, model, n_lists=0, batch_size=BATCH_SIZE,
+              encoder=None, encoder_revision=None):
+        """Embed every row of `df` (text,label,class) and write the index to `out_dir`
+
+        `encoder` (the model path or Hub id) and `encoder_revision` (its Hub
+        branch, tag or commit) are recorded so servers can refuse queries
+        embedded by a different model.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        df = df.dropna(subset=['text']).reset_index(drop=True)
+        texts = df['text'].astype(str).tolist()
+        dim = model.config.dim
+
+        matrix = np.memmap(os.path.join(out_dir, EMBEDDINGS_FILE), dtype=np.float16,
+                           mode='w+', shape=(len(texts), dim))
+        # Embed in slices so the whole float32 matrix never sits in memory
+        slice_size = batch_size * 64
+        for start in range(0, len(texts), slice_size):
+            chunk = embed_texts(texts[start:start + slice_size], tokenizer, model, batch_size)
+            matrix[start:start + len(chunk)] = chunk.astype(np.float16)
+            print(f"Embedded {min(start + slice_size, len(texts))}/{len(texts)}")
+        matrix.flush()
+
+        examples_file = EXAMPLES_FILES[0] if dataset_io.pa is not None else EXAMPLES_FILES[1]
+        write_dataset(df[[c for c in dataset_io.COLUMNS if c in df.columns]],
+                      os.path.join(out_dir, examples_file))
+
+        n_lists = min(n_lists, len(texts))
+        if n_lists:
+            centroids = _kmeans(matrix, n_lists)
+            assign = np.empty(len(texts), dtype=np.int32)
+            for start in range(0, len(texts), SEARCH_CHUNK):
+                block = np.asarray(matrix[start:start + SEARCH_CHUNK], dtype=np.float32)
+                assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            order = np.argsort(assign, kind='stable').astype(np.int64)
+            offsets = np.searchsorted(assign[order], np.arange(n_lists + 1)).astype(np.int64)
+            np.savez(os.path.join(out_dir, IVF_FILE), centroids=centroids, order=order, offsets=offsets)
+
+        with open(os.path.join(out_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'count': len(texts), 'dim': dim, 'ivf_lists': n_lists,
+                       'encoder': encoder, 'encoder_revision': encoder_revision}, f)
+
+        return cls(out_dir)
+
+    def _candidates(self, query, nprobe):
+        """Row ids in the `nprobe` IVF lists nearest to `query`"""
+        nearest = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.concatenate([
+            self.list_order[self.list_offsets[c]:self.list_offsets[c + 1]] for c in nearest
+        ])
+
+    def _scan(self, rows, queries, k):
+        """Top k of `rows` for every query as [(row_ids, scores), ...]
+
+        Each SEARCH_CHUNK of rows is read and converted once and scored
+        against all queries together; only a running top k per query is kept.
+        """
+        rows = np.sort(rows)  # sequential reads from the memmap
+        k = min(k, len(rows))
+        if k <= 0:
+            return [(np.array([], dtype=np.int64), np.array([], dtype=np.float32))] * len(queries)
+
+        best_ids = np.empty((0, len(queries)), dtype=np.int64)
+        best_scores = np.empty((0, len(queries)), dtype=np.float32)
+        for start in range(0, len(rows), SEARCH_CHUNK):
+            chunk = rows[start:start + SEARCH_CHUNK]
+            if chunk[-1] - chunk[0] + 1 == len(chunk):
+                block = self.embeddings[chunk[0]:chunk[-1] + 1]  # contiguous: plain slice
+            else:
+                block = self.embeddings[chunk]
+            scores = np.concatenate([best_scores, block.astype(np.float32) @ queries.T])
+            ids = np.concatenate([best_ids, np.broadcast_to(chunk[:, None], (len(chunk), len(queries)))])
+            keep = min(k, len(scores))
+            top = np.argpartition(-scores, keep - 1, axis=0)[:keep]
+            best_ids = np.take_along_axis(ids, top, axis=0)
+            best_scores = np.take_along_axis(scores, top, axis=0)
+
+        order = np.argsort(-best_scores, axis=0)
+        best_ids = np.take_along_axis(best_ids, order, axis=0)
+        best_scores = np.take_along_axis(best_scores, order, axis=0)
+        return [(best_ids[:, q], best_scores[:, q]) for q in range(len(queries))]
+
+    def search_batch(self, queries, k=5, nprobe=8):
+        """Return [(row_ids, scores), ...] of the k most similar rows for each unit-norm query row"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.meta['dim'])
+        if self.centroids is None:
+            return self._scan(np.arange(len(self)), queries, k)
+        # IVF: each query scans only the rows in its own nearest lists
+        return [self._scan(self._candidates(query, nprobe), query[None], k)[0] for query in queries]
+
+    def search(self, query, k=5, nprobe=8):
+        """Return (row_ids, scores) of the k most similar rows to a unit-norm query vector"""
+        return self.search_batch(query, k=k, nprobe=nprobe)[0]
+
+    @property
+    def encoder(self):
+        """Model the index was embedded with; queries must use the same one"""
+        return self.meta.get('encoder')
+
+    @property
+    def encoder_revision(self):
+        return self.meta.get('encoder_revision')
+
+    def matches(self, source, hub_revision=None):
+        """True when queries embedded by `source`@`hub_revision` share the index's embedding space"""
+        # The Hub resolves no revision to "main"
+        return (self.encoder == source
+                and (self.encoder_revision or 'main') == (hub_revision or 'main'))
+
+    def _example(self, row_id, score):
+        row = self.examples.iloc[int(row_id)]
+        label = row.get('label')
+        cls = row.get('class')
+        # Annotation corpora can have unlabeled rows
+        return {
+            "text": row['text'],
+            "label": None if pd.isna(label) else int(label),
+            "class": None if pd.isna(cls) else cls,
+            "score": float(score)
+        }
+
+    def similar_batch(self, texts, tokenizer, model, k=5, nprobe=8):
+        """Embed all `texts` in one pass, search them together and return the k nearest examples for each"""
+        hits = self.search_batch(embed_texts(texts, tokenizer, model), k=k, nprobe=nprobe)
+        return [[self._example(row_id, score) for row_id, score in zip(ids, scores)] for ids, scores in hits]
+
+    def similar(self, text, tokenizer, model, k=5, nprobe=8):
+        """Embed `text` and return the k nearest examples as dicts"""
+        return self.similar_batch([text], tokenizer, model, k=k, nprobe=nprobe)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query a CopiumMeter embedding index")
+    parser.add_argument('--model', default=MODEL_PATH,
+                        help="copium_model path or Hub id; must match the model that will serve queries")
+    parser.add_argument('--revision', default=None, help="Hub branch, tag or commit of --model")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Embed a text,label,class dataset")
+    build.add_argument('dataset', help="CSV, Parquet or Arrow file with a 'text' column (label/class optional)")
+    build.add_argument('--out', default='copium_index', help="Output index directory")
+    build.add_argument('--ivf', type=int, default=0, help="Number of IVF lists (0 = brute force)")
+    build.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    search = sub.add_parser('search', help="Find examples similar to a text")
+    search.add_argument('index', help="Index directory")
+    search.add_argument('text', help="Query text")
+    search.add_argument('-k', type=int, default=5)
+    search.add_argument('--nprobe', type=int, default=8)
+
+    args = parser.parse_args()
+
+    print("Loading model...")
+    tokenizer, model = load_encoder(args.model, args.revision)
+
+    if args.command == 'build':
+        available = dataset_columns(args.dataset)
+        if 'text' not in available:
+            parser.error(f"{args.dataset} has no 'text' column")
+        df = read_dataset(args.dataset, columns=[c for c in dataset_io.COLUMNS if c in available])
+        index = EmbeddingIndex.build(df, args.out, tokenizer, model,
+                                     n_lists=args.ivf, batch_size=args.batch_size,
+                                     encoder=args.model, encoder_revision=args.revision)
+        print(f"✅ Indexed {len(index)} examples into {args.out}/")
+    else:
+        index = EmbeddingIndex(args.index)
+        if not index.matches(args.model, args.revision):
+            print(f"⚠️ Index was built with {index.encoder}@{index.encoder_revision or 'main'}, "
+                  f"querying with {args.model}@{args.revision or 'main'}; scores are not comparable")
+        for i, hit in enumerate(index.similar(args.text, tokenizer, model, k=args.k, nprobe=args.nprobe), 1):
+            print(f"{i}. [{hit['score']:.3f}] ({hit['class']}) {hit['text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+CopiumMeter Model Registry
+Serve several model revisions side by side and hot-swap between them.
+
+New revisions load and warm up in a background thread, then traffic either
+switches to them atomically or is split by percentage for A/B comparison.
+Each request holds on to the version it started on until it finishes; a
+version that no longer receives traffic is unloaded once its last in-flight
+request drains.
+
+A version's `revision` is its routing label (what responses are tagged with
+and what traffic splits refer to); `source` and `hub_revision` are what was
+actually loaded. Deploying to a label that is already loaded needs
+`replace=True`; the old version then drains like any retired one.
+"""
+
+import gc
+import math
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import torch
+from transformers import pipeline
+
+from explain import Explainer
+
+WARMUP_TEXTS = [
+    "No worries, I love losing every day",
+    "Oh great, another bug, just what I needed!",
+    "I’m happy with my grade.",
+    "The match starts at 7PM.",
+]
+LATENCY_WINDOW = 1000  # recent samples kept per version and endpoint for percentiles
+
+
+def _validate_percent(percent, name):
+    if isinstance(percent, bool) or not isinstance(percent, (int, float)) or not math.isfinite(percent):
+        raise ValueError(f"Traffic for {name} must be a number, got {percent!r}")
+    if not 0 <= percent <= 100:
+        raise ValueError(f"Traffic for {name} must be between 0 and 100, got {percent}")
+
+
+class _LatencyStats:
+    """Per-text latency of one kind of work (one endpoint) on one version"""
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+        self.total_seconds = 0.0
+        self.per_text = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds, n_texts):
+        self.calls += 1
+        self.texts += n_texts
+        self.total_seconds += seconds
+        self.per_text.append(seconds / n_texts)
+
+    def summary(self):
+        recent = sorted(self.per_text)
+
+        def percentile(p):
+            return recent[min(int(p * len(recent)), len(recent) - 1)] * 1000 if recent else None
+
+        return {
+            "calls": self.calls,
+            "texts": self.texts,
+            "mean_ms_per_text": self.total_seconds / self.texts * 1000 if self.texts else None,
+            "p50_ms_per_text": percentile(0.50),
+            "p95_ms_per_text": percentile(0.95),
+            "p99_ms_per_text": percentile(0.99),
+        }
+
+
+class ModelVersion:
+    """One loaded revision plus its in-flight count and latency metrics"""
+
+    def __init__(self, revision, source, hub_revision=None):
+        self.revision = revision
+        self.source = source
+        self.hub_revision = hub_revision
+        self.classifier = pipeline("text-classification", model=source, revision=hub_revision, top_k=None)
+        self.explainer = Explainer(self.classifier.model, self.classifier.tokenizer)
+        self.in_flight = 0
+        self.retired = False
+        self.requests = 0
+        self.latency = {}  # endpoint -> _LatencyStats
+        self._stats_lock = threading.Lock()
+
+    def warmup(self, texts=WARMUP_TEXTS):
+        for text in texts:
+            self.classifier(text)
+
+    @contextmanager
+    def timed(self, endpoint, n_texts=1):
+        """Time only the model work inside the block, recorded per text under `endpoint`"""
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.latency.setdefault(endpoint, _LatencyStats()).record(elapsed, max(n_texts, 1))
+
+    def unload(self):
+        self.classifier = None
+        self.explainer = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def stats(self):
+        with self._stats_lock:
+            latency = {endpoint: s.summary() for endpoint, s in self.latency.items()}
+        return {
+            "revision": self.revision,
+            "source": self.source,
+            "hub_revision": self.hub_revision,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "retired": self.retired,
+            "latency": latency,
+        }
+
+
+class ModelRegistry:
+    """Routes requests across loaded versions by traffic percentage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.versions = {}
+        self.draining = []  # replaced versions finishing their in-flight requests
+        self.traffic = {}  # revision -> percent
+        self.loading = {}  # revision -> "loading" | error message
+
+    def _check_load(self, source, revision, traffic, hub_revision, replace):
+        revision = revision or (f"{source}@{hub_revision}" if hub_revision else source)
+        _validate_percent(traffic, revision)
+        if traffic == 0:
+            raise ValueError(f"Traffic for {revision} must be above 0 or it would be unloaded immediately")
+        if revision in self.versions and not replace:
+            raise ValueError(f"Model revision {revision} is already loaded; pass replace to redeploy it")
+        return revision
+
+    def load(self, source, revision=None, traffic=100, hub_revision=None, replace=False):
+        """Load and warm up a revision synchronously, then route `traffic`% to it
+
+        `revision` is the routing label (defaults to source[@hub_revision]);
+        `hub_revision` is the branch, tag or commit passed to the Hub.
+        An already-loaded label is only redeployed with `replace=True`.
+        """
+        revision = self._check_load(source, revision, traffic, hub_revision, replace)
+        version = ModelVersion(revision, source, hub_revision)
+        version.warmup()
+        to_unload = None
+        with self._lock:
+            old = self.versions.get(revision)
+            if old is not None:
+                if not replace:
+                    raise ValueError(f"Model revision {revision} is already loaded; pass replace to redeploy it")
+                old.retired = True
+                if old.in_flight:
+                    self.draining.append(old)
+                else:
+                    to_unload = old
+            self.versions[revision] = version
+            self.loading.pop(revision, None)
+        if to_unload is not None:
+            to_unload.unload()
+        self.set_traffic({revision: traffic} if traffic >= 100 else self._split(revision, traffic))
+        return version
+
+    def load_async(self, source, revision=None, traffic=100, hub_revision=None, replace=False):
+        """Same as `load`, in a background thread so serving is never blocked"""
+        with self._lock:
+            revision = self._check_load(source, revision, traffic, hub_revision, replace)
+            if self.loading.get(revision) == "loading":
+                raise ValueError(f"Model revision {revision} is already loading")
+            self.loading[revision] = "loading"
+
+        def run():
+            try:
+                self.load(source, revision, traffic, hub_revision, replace)
+                print(f"Model revision {revision} is live ({traffic}% traffic)")
+            except Exception as e:
+                with self._lock:
+                    self.loading[revision] = f"failed: {e}"
+                print(f"Failed to load model revision {revision}: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+        return revision
+
+    def _split(self, revision, percent):
+        """Give `percent` to `revision` and scale the current split into the rest"""
+        with self._lock:
+            others = {r: p for r, p in self.traffic.items() if r != revision}
+        total = sum(others.values()) or 1
+        split = {r: p * (100 - percent) / total for r, p in others.items()}
+        split[revision] = percent
+        return split
+
+    def set_traffic(self, traffic):
+        """Atomically replace the routing table; unrouted versions are retired"""
+        if not isinstance(traffic, dict):
+            raise ValueError('Traffic must be an object like {"main": 90, "v2": 10}')
+        for revision, percent in traffic.items():
+            _validate_percent(percent, revision)
+        traffic = {r: float(p) for r, p in traffic.items() if p > 0}
+        to_unload = []
+        with self._lock:
+            missing = [r for r in traffic if r not in self.versions]
+            if missing:
+                raise ValueError(f"Unknown model revision(s): {', '.join(missing)}")
+            if not traffic:
+                raise ValueError("At least one revision must receive traffic")
+
+            self.traffic = traffic
+            for revision, version in list(self.versions.items()):
+                version.retired = revision not in traffic
+                if version.retired and version.in_flight == 0:
+                    to_unload.append(self.versions.pop(revision))
+
+        for version in to_unload:
+            version.unload()
+
+    def _choose(self):
+        revisions = list(self.traffic)
+        weights = [self.traffic[r] for r in revisions]
+        return self.versions[random.choices(revisions, weights)[0]]
+
+    @contextmanager
+    def acquire(self):
+        """Pin one version for the duration of a request; time model work with `version.timed`"""
+        with self._lock:
+            version = self._choose()
+            version.in_flight += 1
+            version.requests += 1
+
+        try:
+            yield version
+        finally:
+            unload = False
+            with self._lock:
+                version.in_flight -= 1
+                # Last request on a retired version: free its memory
+                if version.retired and version.in_flight == 0:
+                    if self.versions.get(version.revision) is version:
+                        del self.versions[version.revision]
+                        unload = True
+                    elif version in self.draining:
+                        self.draining.remove(version)
+                        unload = True
+            if unload:
+                version.unload()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "traffic": dict(self.traffic),
+                "loading": dict(self.loading),
+                "versions": [v.stats() for v in self.versions.values()],
+                "draining": [v.stats() for v in self.draining],
+            }
@@ -0,0 +1,149 @@
+"""
+CopiumMeter Profiling
+On-demand torch.profiler + Python stack sampling for serving and training hot paths.
+
+Wrap a hot path in `profiler.capture(name)`. While disabled this is one
+attribute check returning a shared no-op context, so it can stay in
+production code. Enable it for a sampled fraction of calls (serving) or
+for the next N calls (training steps):
+
+    profiler.enable(rate=0.01)    # profile ~1% of requests
+    profiler.enable(steps=20)     # profile the next 20 free training steps
+
+torch.profiler allows one session per process, so only one capture runs at
+a time; calls that would overlap an active capture run unprofiled. The
+artifacts are exported on a background thread after the captured block
+ends, so the profiled request does not pay for writing them.
+
+Each capture writes to `output_dir`:
+    <name>-<timestamp>-<pid>-<n>.trace.json   Chrome trace (chrome://tracing, Perfetto)
+    <name>-<timestamp>-<pid>-<n>.folded       collapsed Python stacks (flamegraph.pl, speedscope)
+    <name>-<timestamp>-<pid>-<n>.ops.txt      per-operator summary table
+"""
+
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+import torch
+
+PROFILE_DIR = os.environ.get("COPIUM_PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = 0.001  # seconds between Python stack samples
+TABLE_ROWS = 40
+
+_NO_PROFILE = nullcontext()
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into folded-stack counts"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class Profiler:
+    """Runtime-switchable profiler; disabled by default"""
+
+    def __init__(self, output_dir=PROFILE_DIR):
+        self.output_dir = output_dir
+        self.rate = 0.0
+        self.steps = 0
+        self.enabled = False
+        self._lock = threading.Lock()
+        # Held from the start of a capture until its artifacts are written
+        self._active = threading.Lock()
+        self._seq = itertools.count()
+
+    def enable(self, rate=0.0, steps=0):
+        """Profile a `rate` fraction of calls, or exactly the next `steps` calls"""
+        with self._lock:
+            self.rate = rate
+            self.steps = steps
+            self.enabled = rate > 0 or steps > 0
+
+    def disable(self):
+        self.enable(0.0, 0)
+
+    def _should_capture(self):
+        with self._lock:
+            wanted = self.steps > 0 or random.random() < self.rate
+            if not wanted or not self._active.acquire(blocking=False):
+                return False
+            if self.steps > 0:
+                self.steps -= 1
+                if self.steps == 0 and self.rate <= 0:
+                    self.enabled = False
+            return True
+
+    def capture(self, name):
+        """Context manager around one request or training step"""
+        if not self.enabled or not self._should_capture():
+            return _NO_PROFILE
+        return self._profile(name)
+
+    @contextmanager
+    def _profile(self, name):
+        # Called with self._active held; released once the artifacts are written
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+        sampler = _StackSampler(threading.get_ident())
+        try:
+            with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+                sampler.start()
+                try:
+                    yield
+                finally:
+                    sampler.stop()
+        except BaseException:
+            self._active.release()
+            raise
+
+        threading.Thread(
+            target=self._write, args=(name, prof, sampler.counts), daemon=True
+        ).start()
+
+    def _write(self, name, prof, stack_counts):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._seq)}")
+
+            prof.export_chrome_trace(f"{base}.trace.json")
+            with open(f"{base}.folded", "w", encoding="utf-8") as f:
+                for stack, count in stack_counts.most_common():
+                    f.write(f"{stack} {count}\n")
+            with open(f"{base}.ops.txt", "w", encoding="utf-8") as f:
+                f.write(prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=TABLE_ROWS))
+
+            print(f"Profile written: {base}.*")
+        finally:
+            self._active.release()
+
+
+# Shared instance used by app.py and the training notebook
+profiler = Profiler()
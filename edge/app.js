@@ -310,9 +310,39 @@ async function classifyWithLocalModel(text) {
     };
 }
 
+async function classifyWithJsonApi(text) {
+    // Single POST to the lightweight JSON endpoint (no Gradio queue/SSE round trip)
+    const response = await fetch(`${API_BASE}/v1/classify`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ text: text })
+    });
+    
+    if (!response.ok) {
+        throw new Error(`JSON API call failed: ${response.status}`);
+    }
+    
+    const result = await response.json();
+    return {
+        prediction: result.prediction,
+        confidence: result.confidence * 100,
+        allResults: result.results.map(r => ({
+            label: r.label,
+            score: r.score * 100
+        }))
+    };
+}
+
 async function classifyWithApi(text) {
     console.log('☁️ Using cloud API for inference...');
     
+    // Fast path first; older Spaces without /v1/classify fall back to the Gradio API
+    try {
+        return await classifyWithJsonApi(text);
+    } catch (error) {
+        console.warn('JSON endpoint unavailable, using Gradio API:', error.message);
+    }
+    
     try {
         // Gradio 4+ uses /gradio_api prefix and SSE protocol
         // First, initiate the call
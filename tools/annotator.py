@@ -254,7 +254,7 @@ class AnnotationTool:
     def load_dataset(self):
         file_path = filedialog.askopenfilename(
             title="Select Sarcasm Dataset",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            filetypes=[("Datasets", "*.csv *.parquet"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("All files", "*.*")],
             initialdir="../cloud"
         )
         
@@ -265,8 +265,11 @@ class AnnotationTool:
             self.progress_var.set("Loading dataset... (this may take a moment)")
             self.root.update()
             
-            # Load only necessary columns
-            self.df = pd.read_csv(file_path, usecols=['label', 'comment'])
+            # Load only necessary columns (Parquet skips the other columns entirely)
+            if file_path.lower().endswith('.parquet'):
+                self.df = pd.read_parquet(file_path, columns=['label', 'comment'])
+            else:
+                self.df = pd.read_csv(file_path, usecols=['label', 'comment'])
             
             # Clean data
             self.df = self.df.dropna(subset=['comment'])
@@ -402,7 +405,7 @@ class AnnotationTool:
         file_path = filedialog.asksaveasfilename(
             title="Save Annotations",
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
+            filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("Arrow files", "*.arrow *.feather")],
             initialfile="copium_dataset.csv",
             initialdir="../cloud"
         )
@@ -410,9 +413,26 @@ class AnnotationTool:
         if file_path:
             # Ensure column order matches expected format: text, label, class
             df_out = pd.DataFrame(annotated)[['text', 'label', 'class']]
-            df_out.to_csv(file_path, index=False)
+            if not self.write_dataset(df_out, file_path):
+                return
             messagebox.showinfo("Saved", f"Saved {len(annotated)} annotations to:\n{file_path}")
 
+    def write_dataset(self, df_out, file_path):
+        """Write Parquet/Arrow/CSV by extension (as cloud/dataset_io.py); False if it failed"""
+        ext = os.path.splitext(file_path)[1].lower()
+        try:
+            if ext in ('.parquet', '.pq'):
+                df_out.to_parquet(file_path, index=False)
+            elif ext in ('.arrow', '.feather', '.ipc'):
+                df_out.to_feather(file_path)
+            else:
+                df_out.to_csv(file_path, index=False)
+        except Exception as e:
+            # e.g. pyarrow missing for Parquet/Arrow
+            messagebox.showerror("Error", f"Failed to save dataset:\n{str(e)}")
+            return False
+        return True
+
     def export_dataset(self):
         """Export a balanced dataset with 2500 samples per class"""
         if self.samples is None or len(self.samples) == 0:
@@ -480,7 +500,7 @@ class AnnotationTool:
         file_path = filedialog.asksaveasfilename(
             title="Export Dataset",
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
+            filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("Arrow files", "*.arrow *.feather")],
             initialfile="copium_dataset.csv",
             initialdir="../cloud"
         )
@@ -488,7 +508,8 @@ class AnnotationTool:
         if file_path:
             # Ensure column order matches expected format: text, label, class
             df_out = pd.DataFrame(all_samples)[['text', 'label', 'class']]
-            df_out.to_csv(file_path, index=False)
+            if not self.write_dataset(df_out, file_path):
+                return
             messagebox.showinfo(
                 "Exported", 
                 f"Exported {len(df_out)} samples to:\n{file_path}\n\n"